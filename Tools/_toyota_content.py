@@ -0,0 +1,117 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Toyota Qatar content (GraphQL persisted query) endpoints
+MODELS_URL = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/TrimsEndpoint;language=en;brand=toyota"
+OFFERS_URL = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/T4-MainSpecialOffers;language=en;brand=toyota;"
+TERMS_URL = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/T26-Terms-Conditions;language=en;brand=toyota"
+
+# How long a fetched payload is served from memory before it is re-fetched
+CACHE_TTL_SECONDS = 300
+
+
+def _json_session(max_retries: Union[int, Retry] = 0) -> requests.Session:
+    """Create an HTTP session for a JSON API, with a pooled keep-alive adapter for https."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=32, max_retries=max_retries))
+    # requests already sends Accept-Encoding: gzip, deflate (plus br when brotli is installed)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
+# Shared HTTP session so all content tools reuse the same connection pool
+_SESSION = _json_session()
+
+# Worker pool shared by the tools that fan out several lookups per call; a task
+# must not wait on another task in this pool, or a full pool can deadlock
+_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# url -> (expires_at, parsed JSON payload, lookup indexes derived from the payload)
+_CACHE: Dict[str, Tuple[float, Any, Dict[str, Any]]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _fetch_cached(url: str, ttl: float = CACHE_TTL_SECONDS) -> Any:
+    """Fetch and parse the JSON payload at url, serving repeat calls from memory.
+
+    Payloads are cached per URL for ttl seconds. Callers share the cached
+    object and must not mutate it.
+
+    Raises:
+        requests.exceptions.RequestException: For connection errors or non-2xx responses
+    """
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    response = _SESSION.get(url, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+
+    with _CACHE_LOCK:
+        _CACHE[url] = (now + ttl, data, {})
+    return data
+
+
+def _peek_cached(url: str) -> Any:
+    """Return the cached payload for url if it is still fresh, without any network access."""
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _cached_index(url: str, data: Any, name: str, build: Callable[[], Any]) -> Any:
+    """Return a lookup index derived from the cached payload of url.
+
+    build() runs once per cache entry and its result is kept next to the
+    payload, so it expires together with it. If data is no longer the cached
+    payload the index is built but not stored.
+    """
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+        if entry is not None and entry[1] is data and name in entry[2]:
+            return entry[2][name]
+
+    index = build()
+
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+        if entry is not None and entry[1] is data:
+            entry[2][name] = index
+    return index
+
+
+@lru_cache(maxsize=4096)
+def _lc(s: Optional[str]) -> str:
+    """Case-fold s for matching, memoised because cached payloads repeat the same strings."""
+    return s.casefold() if s else ""
+
+
+def _build_slug_index(items: List[Dict]) -> Dict[str, List[int]]:
+    """Map each distinct case-folded slug to the positions of the items carrying it.
+
+    Payloads repeat slugs, so a lookup tests each distinct slug once instead
+    of every item.
+    """
+    index = defaultdict(list)
+    for position, item in enumerate(items):
+        index[_lc(item.get('slug'))].append(position)
+    return dict(index)
+
+
+def _lookup_slug(slug_index: Dict[str, List[int]], items: List[Dict], slug: str) -> List[Dict]:
+    """Return the items, in payload order, whose slug contains slug (spaces read as hyphens)."""
+    query = _lc(slug.replace(" ", "-"))
+    positions = sorted(i for key, found in slug_index.items() if query in key for i in found)
+    return [items[i] for i in positions]
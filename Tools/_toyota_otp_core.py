@@ -0,0 +1,265 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import re
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+from functools import lru_cache
+from collections import deque
+from datetime import datetime
+
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    from json import dumps as _stdlib_json_dumps, loads as _json_loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return _stdlib_json_dumps(obj).encode()
+
+# Toyota Qatar OTP request endpoint, shared by request_toyota_otp and request_toyota_mobile_otp
+OTP_REQUEST_URL = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/auth/otp/mobile/request"
+
+# Characters removed from a mobile number before validation (anything but digits and +)
+_NON_MOBILE_CHARS_RE = re.compile(r'[^\d+]')
+# The same removal for ASCII input as a str.translate table: every other ASCII character maps to None
+_NON_MOBILE_ASCII_TABLE = dict.fromkeys(c for c in range(128) if chr(c) not in '0123456789+')
+
+# (connect, read) timeouts: fail fast on a stalled handshake, allow time for the SMS gateway
+_REQUEST_TIMEOUT = (3.05, 27)
+
+# At most OTP_RATE_LIMIT requests per number in any OTP_RATE_WINDOW_SECONDS, so a looping
+# agent cannot flood a user with SMS or get the client banned by the backend
+OTP_RATE_LIMIT = 3
+OTP_RATE_WINDOW_SECONDS = 60
+# Once this many numbers are tracked, numbers with no request inside the window are dropped
+_OTP_RATE_MAX_TRACKED = 4096
+
+# cleaned mobile number -> monotonic times of its recent OTP requests, across both tools
+_OTP_REQUEST_TIMES: Dict[str, deque] = {}
+_OTP_RATE_LOCK = threading.Lock()
+
+# (epoch second, ISO timestamp) of the most recently formatted response time
+_TIMESTAMP_CACHE = (0, "")
+
+# Per-tool wording and headers, keyed by include_response_code:
+# True is request_toyota_mobile_otp, False is request_toyota_otp
+_PROFILES: Dict[bool, Dict[str, Any]] = {
+    True: {
+        "invalid_format": ("Invalid mobile number format", "Please provide a valid mobile number in international format (e.g., +97403012045)"),
+        "invalid_qatar": ("Invalid Qatar mobile number length", "Qatar mobile numbers should have exactly 8 digits after +974"),
+        "no_data": "No response data received from server",
+        "api_message_key": "api_message",
+        "headers": {"User-Agent": "Toyota-OTP-Client/1.0"},
+    },
+    False: {
+        "invalid_format": ("Invalid mobile number format", "Please provide a valid mobile number in international format (e.g., +97403012026)"),
+        "invalid_qatar": ("Invalid Qatar mobile number", "Qatar mobile numbers should be 8 digits after +974"),
+        "no_data": "OTP request failed: No response from server",
+        "api_message_key": "response_message",
+        "headers": None,
+    },
+}
+
+# Shared HTTP session so OTP requests from both tools reuse the same pooled keep-alive connections
+_SESSION = requests.Session()
+# Bodies are pre-encoded JSON bytes, so the content type is declared on the session
+_SESSION.headers.update({"Content-Type": "application/json"})
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    # Requesting an OTP sends an SMS, so only retry when the request cannot have
+    # been acted on: connection failures and throttling/unavailable responses
+    max_retries=Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 503],
+        allowed_methods=["POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+
+
+def _request_otp_impl(mobile: str, *, include_response_code: bool) -> Dict[str, Any]:
+    """Request an OTP for mobile and build the calling tool's response.
+
+    Args:
+        mobile (str): Mobile number in international format (e.g., '+97403012026')
+        include_response_code (bool): True for request_toyota_mobile_otp's response shape
+            (response_code on every result, api_message on success), False for
+            request_toyota_otp's (response_message on success)
+
+    Returns:
+        dict: The tool response; see the two tool docstrings for the fields
+    """
+    profile = _PROFILES[include_response_code]
+    try:
+        # Validate mobile number format
+        validation_error = _validate_mobile_number(mobile, include_response_code=include_response_code)
+        if validation_error:
+            return validation_error
+
+        # Throttle repeated requests for the same number
+        retry_after = _reserve_otp_request(mobile)
+        if retry_after is not None:
+            return _error(
+                f"Too many OTP requests for this number; retry in {retry_after} seconds",
+                "Please wait before requesting another OTP",
+                status="rate_limited",
+                include_response_code=include_response_code
+            )
+
+        # Make API request; the JSON content type is set on the session
+        response = _SESSION.post(
+            OTP_REQUEST_URL,
+            data=_request_body(mobile),
+            headers=profile["headers"],
+            timeout=_REQUEST_TIMEOUT
+        )
+
+        # Check if request was successful
+        if response.status_code != 200:
+            return _error(f"API request failed with status code: {response.status_code}", "Failed to send OTP",
+                          include_response_code=include_response_code)
+
+        data = _json_loads(response.content)
+
+        # Check if data is available and response is successful (responseCode 1)
+        if not data:
+            return _error(profile["no_data"], "Failed to send OTP", include_response_code=include_response_code)
+
+        response_code = data.get('responseCode')
+        if response_code != 1:
+            error_message = data.get('message', 'Unknown error occurred')
+            return _error(f"OTP request failed: {error_message}", "Failed to send OTP",
+                          include_response_code=include_response_code, response_code=response_code)
+
+        # Extract response data
+        inner = data.get('data') or {}
+        server_time = inner.get('time')
+        if not include_response_code:
+            # request_toyota_otp reports an empty server time as None;
+            # request_toyota_mobile_otp passes it through as sent
+            server_time = server_time or None
+
+        result = {
+            "status": "success",
+            "message": "OTP sent successfully",
+            "timestamp": _now_iso(),
+            "server_time": server_time
+        }
+        if include_response_code:
+            result["response_code"] = response_code
+        result[profile["api_message_key"]] = data.get('message', 'Success')
+        return result
+
+    except requests.exceptions.RequestException as e:
+        if include_response_code and isinstance(e, requests.exceptions.Timeout):
+            return _error("API request timed out", "Network timeout while sending OTP", include_response_code=True)
+        return _error(f"API request failed: {str(e)}", "Network error while sending OTP",
+                      include_response_code=include_response_code)
+    except Exception as e:
+        return _error(f"OTP request failed: {str(e)}", "Unexpected error occurred",
+                      include_response_code=include_response_code)
+
+
+def _clean_mobile_number(mobile: str) -> str:
+    """Remove any spaces or special characters except + from a mobile number."""
+    # Non-ASCII input goes through the regex so Unicode digits are kept exactly as \d keeps them
+    if mobile.isascii():
+        return mobile.translate(_NON_MOBILE_ASCII_TABLE)
+    return _NON_MOBILE_CHARS_RE.sub('', mobile)
+
+
+def _reserve_otp_request(mobile: str) -> Optional[int]:
+    """Record an OTP request for mobile, or return the seconds to wait if it is over the rate limit."""
+    key = _clean_mobile_number(mobile)
+    now = time.monotonic()
+    window_start = now - OTP_RATE_WINDOW_SECONDS
+    with _OTP_RATE_LOCK:
+        times = _OTP_REQUEST_TIMES.get(key)
+        if times is None:
+            if len(_OTP_REQUEST_TIMES) >= _OTP_RATE_MAX_TRACKED:
+                for stale in [k for k, t in _OTP_REQUEST_TIMES.items() if not t or t[-1] <= window_start]:
+                    del _OTP_REQUEST_TIMES[stale]
+            times = _OTP_REQUEST_TIMES[key] = deque()
+        while times and times[0] <= window_start:
+            times.popleft()
+        if len(times) >= OTP_RATE_LIMIT:
+            return int(times[0] - window_start) + 1
+        times.append(now)
+    return None
+
+
+def _request_body(mobile: str) -> bytes:
+    """Encode the OTP request body, skipping the JSON encoder when mobile is already canonical."""
+    if mobile[:1] == '+' and mobile.isascii() and mobile[1:].isdigit():
+        # '+' and ASCII digits never need JSON escaping
+        return b'{"mobile":"' + mobile.encode('ascii') + b'"}'
+    return _json_dumps({"mobile": mobile})
+
+
+def _now_iso() -> str:
+    """Current local time in ISO format at one-second precision, formatted once per second."""
+    global _TIMESTAMP_CACHE
+    second = int(time.time())
+    cached = _TIMESTAMP_CACHE
+    if cached[0] != second:
+        cached = (second, datetime.fromtimestamp(second).isoformat())
+        # Swapped as one tuple so concurrent callers never see a mismatched pair
+        _TIMESTAMP_CACHE = cached
+    return cached[1]
+
+
+def _error(error: str, message: str, status: str = "error", *, include_response_code: bool = False,
+           response_code: Optional[int] = None) -> Dict[str, Any]:
+    """Build an error response in the calling tool's standard shape.
+
+    Shared by the OTP request tools and verify_toyota_otp_login; only
+    request_toyota_mobile_otp's shape carries response_code.
+    """
+    result = {
+        "status": status,
+        "error": error,
+        "message": message,
+        "timestamp": _now_iso()
+    }
+    if include_response_code:
+        result["response_code"] = response_code
+    return result
+
+
+def _validate_mobile_number(mobile: str, *, include_response_code: bool) -> Optional[Dict]:
+    """Validate the mobile number format, returning the calling tool's error response if it is invalid."""
+    if not mobile:
+        problem = ("Mobile number is required", "Please provide a mobile number")
+    else:
+        problem = _check_mobile_number(mobile, include_response_code)
+
+    if problem is None:
+        return None
+
+    error, message = problem
+    return _error(error, message, status="invalid_mobile", include_response_code=include_response_code)
+
+
+@lru_cache(maxsize=4096)
+def _check_mobile_number(mobile: str, include_response_code: bool) -> Optional[Tuple[str, str]]:
+    """Return (error, message) for an invalid non-empty mobile number, or None if it is valid.
+
+    The result depends only on its arguments, so it is memoised for numbers that are retried or resent.
+    """
+    profile = _PROFILES[include_response_code]
+    cleaned_mobile = _clean_mobile_number(mobile)
+
+    # International format: + followed by 8-15 digits (isdecimal accepts exactly the digits \d does)
+    if not (9 <= len(cleaned_mobile) <= 16 and cleaned_mobile[0] == '+' and cleaned_mobile[1:].isdecimal()):
+        return profile["invalid_format"]
+
+    # Qatar numbers (+974) must have exactly 8 digits after the country code
+    if cleaned_mobile.startswith('+974') and len(cleaned_mobile) != 12:
+        return profile["invalid_qatar"]
+
+    return None
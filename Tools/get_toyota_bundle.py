@@ -0,0 +1,45 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import _EXECUTOR
+import get_toyota_models_new as _models
+import get_toyota_offers_cleaned as _offers
+import get_toyota_terms_and_condition_cleaned_3 as _terms
+
+
+@tool(name="get_toyota_bundle", description="Retrieves Toyota models, offers and terms and conditions in a single call")
+def get_toyota_bundle(
+    car_model: Optional[object] = None,
+    category: Optional[str] = None,
+    slug: Optional[str] = None,
+    offer_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Retrieves Toyota models, offers and terms & conditions concurrently.
+
+    Args:
+        car_model (object, optional): Specific car model to search (e.g., ['RAV4'], ['Camry', 'Corolla'])
+        category (str, optional): Vehicle category (e.g., 'SUV', 'Sedan', 'Hybrid')
+        slug (str, optional): Model to filter offers and terms by (e.g., 'Prado', 'Land Cruiser')
+        offer_type (str, optional): Specific type for terms offer (e.g., 'ramadan')
+
+    Returns:
+        dict: A dictionary containing:
+            - status (str): 'success' when every lookup succeeded, otherwise 'partial'
+            - models (dict): Result of get_toyota_models_new
+            - offers (dict): Result of get_toyota_offers_cleaned
+            - terms_conditions (dict): Result of get_toyota_terms_conditions
+            - timestamp (str): When the request was processed
+    """
+    models_future = _EXECUTOR.submit(_models.get_toyota_models_new, car_model, category)
+    offers_future = _EXECUTOR.submit(_offers.get_toyota_offers, slug)
+    terms_future = _EXECUTOR.submit(_terms.get_toyota_terms_conditions, slug, offer_type)
+
+    models, offers, terms = (f.result() for f in (models_future, offers_future, terms_future))
+
+    return {
+        "status": "success" if all(r.get("status") != "error" for r in (models, offers, terms)) else "partial",
+        "models": models,
+        "offers": offers,
+        "terms_conditions": terms,
+        "timestamp": datetime.now().isoformat()
+    }
@@ -1,7 +1,9 @@
 import requests
 from typing import Optional, Dict, List, Any
 from datetime import datetime
+from collections import defaultdict
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import MODELS_URL, _fetch_cached, _peek_cached, _cached_index, _lc
 import ast
 
 
@@ -23,15 +25,16 @@ def get_toyota_models_new(
             - cars (list): List of vehicle models with details
     """
     try:
-        # API endpoint configuration
-        base_url = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/TrimsEndpoint;language=en;brand=toyota"
         print('car_model', car_model)
         if car_model:
             car_model = ast.literal_eval(car_model)
 
-        # Make API request
-        response = requests.get(base_url)
-        data = response.json()
+        # Skip the request entirely for a category the cached catalogue doesn't have
+        if category and not _is_known_category(category):
+            return transform_api_response(_empty_result(car_model, category))
+
+        # Make API request (served from cache when fresh)
+        data = _fetch_cached(MODELS_URL)
    
         # Check if data is available
         if not data or 'data' not in data:
@@ -48,10 +51,13 @@ def get_toyota_models_new(
 
         print('car_model', car_model)
 
+        name_index = _cached_index(MODELS_URL, data, 'carName', lambda: _build_car_name_index(vehicles_data))
+
         filtered_models = _apply_filters(
             vehicles_data, 
             category,
-            car_model
+            car_model,
+            name_index
         )
         
         # Create the result dictionary first
@@ -86,17 +92,46 @@ def get_toyota_models_new(
             "timestamp": datetime.now().isoformat()
         }
 
+def _empty_result(car_model: Optional[object], category: Optional[str]) -> Dict[str, Any]:
+    """Build the same result the full lookup returns when no vehicle matches."""
+    return {
+        "status": "success",
+        "count": 0,
+        "cars": [],
+        "filters_applied": {
+            "car_model": car_model,
+            "category": category
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _is_known_category(category: str) -> bool:
+    """Check category against the cached catalogue's carTypes.
+
+    Returns True when nothing is cached yet, so the caller still fetches.
+    """
+    data = _peek_cached(MODELS_URL)
+    if not data or 'data' not in data:
+        return True
+    vehicles = data['data']['carFragmentsList']['items']
+    known_categories = _cached_index(MODELS_URL, data, 'categories', lambda: frozenset(_lc(v.get('carTypes')) for v in vehicles))
+    category_lc = _lc(category)
+    return any(category_lc in vehicle_category for vehicle_category in known_categories)
+
 def _apply_filters(
     vehicles: List[Dict], 
     category: Optional[str],
     car_model: Optional[object],
+    name_index: Dict[str, List[int]],
 ) -> List[Dict]:
     """Apply filters to the vehicle list."""
     filtered = vehicles
     print('carModel', car_model, category)
 
     if car_model and len(car_model) > 0:
-        filtered = [v for v in filtered if _matches_car_model(v, car_model)]
+        # Test each distinct carName against the requested models instead of every vehicle
+        positions = _lookup_car_names(name_index, _join_car_models(car_model))
+        filtered = [filtered[i] for i in positions]
 
     # Category filter
     if category:
@@ -104,15 +139,30 @@ def _apply_filters(
     
     return filtered
 
-def _matches_car_model(vehicle: Dict, car_model: object) -> bool:
-    """Check if vehicle matches carModel."""
-    vehicle_name = vehicle.get('carName').lower()
-    return any(vehicle_name in item.lower() for item in car_model)
+def _build_car_name_index(vehicles: List[Dict]) -> Dict[str, List[int]]:
+    """Map each lowercased carName to the positions of the vehicles carrying it."""
+    index = defaultdict(list)
+    for position, vehicle in enumerate(vehicles):
+        index[_lc(vehicle.get('carName'))].append(position)
+    return dict(index)
+
+def _lookup_car_names(name_index: Dict[str, List[int]], models_text: str) -> List[int]:
+    """Return the sorted positions of vehicles whose carName occurs in models_text."""
+    return sorted(i for name, found in name_index.items() if name in models_text for i in found)
+
+def _join_car_models(car_model: object) -> str:
+    """Join the requested models into one NUL-separated search text.
+
+    No car name contains NUL, so a name occurs in the joined text exactly
+    when it occurs in one of the models, and a single C-level substring
+    search replaces the per-model Python loop.
+    """
+    return '\x00'.join(_lc(item) for item in car_model)
 
 def _matches_category(vehicle: Dict, category: str) -> bool:
     """Check if vehicle matches category."""
-    vehicle_category = vehicle.get('carTypes').lower() if vehicle.get('carTypes') != None else ""
-    return category.lower() in vehicle_category
+    vehicle_category = _lc(vehicle.get('carTypes'))
+    return _lc(category) in vehicle_category
 
 
 import json
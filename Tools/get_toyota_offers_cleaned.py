@@ -2,6 +2,7 @@ import requests
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import OFFERS_URL, _fetch_cached, _cached_index, _build_slug_index, _lookup_slug
 
 
 @tool(name="get_toyota_offers_cleaned", description="Retrieves Toyota offers for various models")
@@ -33,13 +34,8 @@ def get_toyota_offers(
         }
     """
     try:
-        # API endpoint configuration
-        base_url = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/T4-MainSpecialOffers;language=en;brand=toyota;"
-        
-        # Make API request
-        response = requests.get(base_url)
-        response.raise_for_status()
-        data = response.json()
+        # Make API request (served from cache when fresh)
+        data = _fetch_cached(OFFERS_URL)
    
         # Check if data is available
         if not data or 'data' not in data:
@@ -56,9 +52,12 @@ def get_toyota_offers(
 
         print(terms_data)
 
+        slug_index = _cached_index(OFFERS_URL, data, 'slug', lambda: _build_slug_index(terms_data))
+
         filtered_terms = _apply_filters(
             terms_data, 
-            slug
+            slug,
+            slug_index
         )
         
         # Remove unwanted fields from each term
@@ -90,23 +89,18 @@ def get_toyota_offers(
 
 def _apply_filters(
     terms_data: List[Dict], 
-    slug: Optional[str]
+    slug: Optional[str],
+    slug_index: Dict[str, List[int]]
 ) -> List[Dict]:
     """Apply filters to the terms and conditions list."""
     filtered = terms_data
 
     if slug:
-        filtered = [t for t in filtered if _matches_slug(t, slug)]
+        # Substring match against each distinct slug rather than every term
+        filtered = _lookup_slug(slug_index, terms_data, slug)
     
     return filtered
 
-def _matches_slug(term: Dict, slug: str) -> bool:
-    """Check if term matches slug."""
-    print('slug', slug)
-    slugData = term.get('slug', '').lower()
-    # print('slug', term, slugData)
-    return slug.replace(" ", "-").lower() in slugData
-
 def _remove_unwanted_fields(term: Dict) -> Dict:
     """Remove unwanted fields from term data."""
     # Fields to remove
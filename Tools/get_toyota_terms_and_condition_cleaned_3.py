@@ -3,6 +3,7 @@ import json
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import TERMS_URL, _fetch_cached, _cached_index, _build_slug_index, _lookup_slug, _lc
 
 
 @tool(name="get_toyota_terms_conditions", description="Retrieves Toyota terms and conditions for various models and offers")
@@ -36,13 +37,8 @@ def get_toyota_terms_conditions(
         }
     """
     try:
-        # API endpoint configuration
-        base_url = "https://csprod.toyotaqatar.com/graphql/execute.json/ToyotaWebsite/T26-Terms-Conditions;language=en;brand=toyota"
-        
-        # Make API request
-        response = requests.get(base_url)
-        response.raise_for_status()
-        data = response.json()
+        # Make API request (served from cache when fresh)
+        data = _fetch_cached(TERMS_URL)
    
         # Check if data is available
         if not data or 'data' not in data:
@@ -57,10 +53,13 @@ def get_toyota_terms_conditions(
         # Extract terms and conditions data from the response structure
         terms_data = data['data']['t26Terms_conditionsList']['items']
 
+        slug_index = _cached_index(TERMS_URL, data, 'slug', lambda: _build_slug_index(terms_data))
+
         filtered_terms = _apply_filters(
             terms_data, 
             slug,
-            offer_type
+            offer_type,
+            slug_index
         )
         
         # Remove _path and clean HTML from conditions
@@ -96,18 +95,21 @@ def get_toyota_terms_conditions(
 def _apply_filters(
     terms_data: List[Dict], 
     slug: Optional[str],
-    offer_type: Optional[str]
+    offer_type: Optional[str],
+    slug_index: Dict[str, List[int]]
 ) -> List[Dict]:
     """Apply filters to the terms and conditions list."""
     filtered = terms_data
+
+    # Narrow by slug first, testing each distinct slug once rather than every term
+    if slug:
+        filtered = _lookup_slug(slug_index, terms_data, slug)
+
     if offer_type and offer_type.lower() == 'ramadan':
         filtered = [t for t in filtered if _matches_ramadan_data(t)]
     else:
         filtered = [t for t in filtered if _matches_main_page_data(t)]
     
-    if slug:
-        filtered = [t for t in filtered if _matches_slug(t, slug)]
-    
     return filtered
 
 def _clean_terms_data(terms_data: List[Dict]) -> List[Dict]:
@@ -132,17 +134,12 @@ def _clean_terms_data(terms_data: List[Dict]) -> List[Dict]:
         cleaned_terms.append(cleaned_term)
     return cleaned_terms
 
-def _matches_slug(term: Dict, slug: str) -> bool:
-    """Check if term matches slug."""
-    slugData = term.get('slug', '').lower()
-    return slug.replace(" ", "-").lower() in slugData
-
 def _matches_main_page_data(term: Dict) -> bool:
-    path = term.get('_path', '').lower()
+    path = _lc(term.get('_path'))
     return 'main-page' in path
 
 def _matches_ramadan_data(term: Dict) -> bool:
-    path = term.get('_path', '').lower()
+    path = _lc(term.get('_path'))
     return 'ramadan-campaign' in path
 
 if __name__ == "__main__":
@@ -1,8 +1,55 @@
 import requests
-from typing import Optional, Dict, List, Any
+import ijson
+import urllib3
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import _json_session, _lc
 import re
+import threading
+import time
+from concurrent.futures import Future
+from collections import defaultdict
+
+
+# Test drive cars API endpoint
+_CARS_URL = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/orders/test_drive/cars"
+
+# How long fetched car records are served from memory before they are re-fetched
+CARS_CACHE_TTL_SECONDS = 120
+
+# Common car models to look for, in order of preference when several are mentioned
+_CAR_MODELS = [
+    'prado', 'corolla', 'camry', 'rav4', 'fortuner', 'hilux', 'innova', 
+    'hiace', 'crown', 'supra', 'gr86', 'raize', 'veloz', 'urban cruiser',
+    'highlander', 'land cruiser', 'lx600', 'ls500', 'es350', 'ux300', 'nx350'
+]
+_CAR_MODEL_RANK = {model: rank for rank, model in enumerate(_CAR_MODELS)}
+# One alternation over the whole vocabulary, so the input is scanned once in C
+_CAR_MODEL_RE = re.compile("|".join(map(re.escape, sorted(_CAR_MODELS, key=len, reverse=True))), re.IGNORECASE)
+
+# Phrasings used to pull an unknown model name out of a request
+_CAR_REQUEST_PATTERNS = [
+    re.compile(r'(?:book|test drive|drive|want|looking for)\s+(?:a|the)?\s*([a-zA-Z0-9\s]+?)(?:\s+test drive|\s+car|\.|$)', re.IGNORECASE),
+    re.compile(r'test drive\s+for\s+([a-zA-Z0-9\s]+)', re.IGNORECASE),
+    re.compile(r'book\s+(?:a|the)?\s*([a-zA-Z0-9\s]+)(?:\s+for test drive)?', re.IGNORECASE),
+]
+_KNOWN_MODEL_WORDS = frozenset({'prado', 'corolla', 'camry', 'rav4', 'fortuner'})
+
+
+# Shared HTTP session so repeated tool calls reuse pooled keep-alive connections
+_SESSION = _json_session(Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
+
+# url -> {expires_at, views, name_index, etag, last_modified}; entries are kept
+# after expiry to revalidate against and as a fallback for outages
+_CARS_CACHE: Dict[str, Dict[str, Any]] = {}
+# url -> result of the fetch currently in progress, shared by concurrent callers
+_CARS_INFLIGHT: Dict[str, Future] = {}
+_CARS_CACHE_LOCK = threading.Lock()
+
+# Upper bound on how long a caller waits for another caller's fetch of the same URL
+_INFLIGHT_WAIT_SECONDS = 60
 
 
 @tool(name="book_test_drive", description="Check car availability and get details for test drive booking")
@@ -20,6 +67,7 @@ def book_test_drive(
             - message (str): Human readable response
             - available_cars (list): List of available cars with details
             - count (int): Number of available cars found
+            - cache_status (str): 'HIT', 'MISS', 'REVALIDATED', or 'STALE' when cached cars were served during an outage
             - timestamp (str): When the request was made
 
     Examples:
@@ -32,6 +80,7 @@ def book_test_drive(
             "timestamp": "2024-01-15T10:30:00"
         }
     """
+    ts = datetime.now().isoformat()
     try:
         # Extract car model from natural language request
         car_model = _extract_car_model(car_request)
@@ -42,42 +91,34 @@ def book_test_drive(
                 "message": "I couldn't identify which car model you're looking for. Please specify the car model (e.g., 'Prado', 'Corolla', 'RAV4').",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
 
-        # API endpoint configuration
-        base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/orders/test_drive/cars"
-        
-        # Make API request
-        response = requests.get(base_url, timeout=10)
-        
+        # Fetch car records (served from cache when fresh)
+        car_records, name_index, cache_status = _fetch_cars_cached()
+
         # Check if request was successful
-        if response.status_code != 200:
+        if cache_status == "http_error":
             return {
                 "status": "error",
                 "message": "Sorry, I'm having trouble accessing the car database right now. Please try again later.",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
-        
-        data = response.json()
    
-        # Check if data is available and response is successful
-        if not data or data.get('responseCode') != 1:
+        # Check if response is successful
+        if cache_status == "invalid_response":
             return {
                 "status": "error",
                 "message": "The car database is currently unavailable. Please try again later.",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
-        
-        # Extract car records from the response structure
-        car_records = data['data']['records']
 
         # Filter for active cars matching the requested model
-        available_cars = _find_available_cars(car_records, car_model)
+        available_cars = _find_available_cars(car_records, car_model, name_index)
         
         # Transform the response to show only essential booking details
         transformed_cars = _transform_for_booking(available_cars)
@@ -94,7 +135,8 @@ def book_test_drive(
                 "message": message,
                 "available_cars": transformed_cars,
                 "count": len(transformed_cars),
-                "timestamp": datetime.now().isoformat()
+                "cache_status": cache_status,
+                "timestamp": ts
             }
         else:
             return {
@@ -102,7 +144,8 @@ def book_test_drive(
                 "message": f"I'm sorry, but I couldn't find any available {car_model} models for test drive at the moment. Please check back later or consider other models.",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "cache_status": cache_status,
+                "timestamp": ts
             }
         
     except requests.exceptions.RequestException as e:
@@ -111,7 +154,7 @@ def book_test_drive(
             "message": "Network error occurred while checking car availability. Please check your connection and try again.",
             "available_cars": [],
             "count": 0,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
     except Exception as e:
         return {
@@ -119,7 +162,7 @@ def book_test_drive(
             "message": "An unexpected error occurred while processing your request. Please try again.",
             "available_cars": [],
             "count": 0,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
 
 
@@ -128,34 +171,18 @@ def _extract_car_model(user_input: str) -> str:
     if not user_input:
         return ""
     
-    # Convert to lowercase for easier matching
-    input_lower = user_input.lower()
-    
-    # Common car models to look for
-    car_models = [
-        'prado', 'corolla', 'camry', 'rav4', 'fortuner', 'hilux', 'innova', 
-        'hiace', 'crown', 'supra', 'gr86', 'raize', 'veloz', 'urban cruiser',
-        'highlander', 'land cruiser', 'lx600', 'ls500', 'es350', 'ux300', 'nx350'
-    ]
-    
-    # Look for car models in the input
-    for model in car_models:
-        if model in input_lower:
-            return model.title()
+    # Look for car models in the input, preferring the earliest in _CAR_MODELS
+    found_models = _CAR_MODEL_RE.findall(user_input)
+    if found_models:
+        return min(found_models, key=lambda model: _CAR_MODEL_RANK[model.lower()]).title()
     
     # Try to extract using patterns
-    patterns = [
-        r'(?:book|test drive|drive|want|looking for)\s+(?:a|the)?\s*([a-zA-Z0-9\s]+?)(?:\s+test drive|\s+car|\.|$)',
-        r'test drive\s+for\s+([a-zA-Z0-9\s]+)',
-        r'book\s+(?:a|the)?\s*([a-zA-Z0-9\s]+)(?:\s+for test drive)?',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, input_lower)
+    for pattern in _CAR_REQUEST_PATTERNS:
+        match = pattern.search(user_input)
         if match:
             potential_model = match.group(1).strip()
             # Check if it matches known models or looks like a car model
-            if any(word in potential_model.lower() for word in ['prado', 'corolla', 'camry', 'rav4', 'fortuner']):
+            if not _KNOWN_MODEL_WORDS.isdisjoint(potential_model.lower().split()):
                 return potential_model.title()
             elif len(potential_model.split()) <= 3:  # Likely a car model name
                 return potential_model.title()
@@ -163,27 +190,177 @@ def _extract_car_model(user_input: str) -> str:
     return ""
 
 
-def _find_available_cars(cars: List[Dict], car_model: str) -> List[Dict]:
-    """Find active cars that match the requested model."""
-    available_cars = []
-    search_term = car_model.lower()
-    
-    for car in cars:
-        # Check if car is active
-        if not car.get('IsActive', False):
+def _find_available_cars(cars: List[Dict], car_model: str, name_index: Dict[str, List[int]]) -> List[Dict]:
+    """Find active cars that match the requested model.
+
+    cars are record views from _car_view and name_index is their index from
+    _build_name_index, so each distinct name or model of interest is tested
+    once instead of once per car. Returns the original car records.
+    """
+    search_term = _lc(car_model)
+    search_words = search_term.split()
+
+    # Check for matches in car name or model of interest
+    positions = {
+        i
+        for key, found in name_index.items()
+        if search_term in key or any(word in key for word in search_words)
+        for i in found
+    }
+    return [cars[i]['orig'] for i in sorted(positions)]
+
+
+def _build_name_index(cars: List[Dict]) -> Dict[str, List[int]]:
+    """Map each distinct lowercase name and model of interest of an active car to the car's positions."""
+    index = defaultdict(list)
+    for i, car in enumerate(cars):
+        if not car['_active']:
             continue
-            
-        car_name = car.get('Name', '').lower()
-        model_interest = car.get('Model_Of_Interest__c', '').lower()
-        
-        # Check for matches in car name or model of interest
-        if (search_term in car_name or 
-            search_term in model_interest or
-            any(word in car_name for word in search_term.split()) or
-            any(word in model_interest for word in search_term.split())):
-            available_cars.append(car)
-    
-    return available_cars
+        index[car['_name_lc']].append(i)
+        if car['_moi_lc'] != car['_name_lc']:
+            index[car['_moi_lc']].append(i)
+    return dict(index)
+
+
+def _car_view(car: Dict) -> Dict:
+    """Wrap a car record with the lowercase fields and active flag used for matching."""
+    return {
+        'orig': car,
+        '_name_lc': _lc(car.get('Name')),
+        '_moi_lc': _lc(car.get('Model_Of_Interest__c')),
+        '_active': bool(car.get('IsActive', False))
+    }
+
+
+def _fetch_cars_cached(ttl: float = CARS_CACHE_TTL_SECONDS) -> Tuple[Optional[List[Dict]], Optional[Dict[str, List[int]]], str]:
+    """Return the /cars record views, serving repeat calls from an in-process TTL cache.
+
+    Each record is wrapped once by _car_view when the cache is filled. Expired
+    entries are revalidated with If-None-Match / If-Modified-Since when the
+    upstream sent an ETag or Last-Modified, so an unchanged catalogue costs a
+    bodiless 304. When the upstream call fails and an earlier payload is
+    cached, that payload is served instead of an error. Cached records are
+    shared and must not be mutated.
+
+    Concurrent misses are coalesced: the first caller fetches and the others
+    wait for its result instead of issuing their own request.
+
+    Returns:
+        tuple: The record views, their name index from _build_name_index,
+            and how they were served: 'HIT', 'MISS', 'REVALIDATED' or
+            'STALE'. With nothing to serve, views and index are None and the
+            status is 'http_error' or 'invalid_response'.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails and nothing is cached
+    """
+    now = time.monotonic()
+    with _CARS_CACHE_LOCK:
+        entry = _CARS_CACHE.get(_CARS_URL)
+        if entry is not None and entry['expires_at'] > now:
+            return entry['views'], entry['name_index'], "HIT"
+        inflight = _CARS_INFLIGHT.get(_CARS_URL)
+        if inflight is None:
+            future = _CARS_INFLIGHT[_CARS_URL] = Future()
+
+    if inflight is not None:
+        return inflight.result(timeout=_INFLIGHT_WAIT_SECONDS)
+
+    try:
+        result = _refresh_cars(entry, now, ttl)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _CARS_CACHE_LOCK:
+            _CARS_INFLIGHT.pop(_CARS_URL, None)
+
+
+def _refresh_cars(entry: Optional[Dict[str, Any]], now: float, ttl: float) -> Tuple[Optional[List[Dict]], Optional[Dict[str, List[int]]], str]:
+    """Fetch /cars from upstream and cache it, falling back to entry on failure."""
+    # Ask the upstream to answer 304 if the cached payload is still current
+    headers = {}
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        with _SESSION.get(_CARS_URL, headers=headers, timeout=10, stream=True) as response:
+            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            # outcome stays None only for a fresh, valid payload
+            if response.status_code == 304 and entry is not None:
+                outcome = "not_modified"
+            elif response.status_code != 200:
+                outcome = "http_error"
+            else:
+                try:
+                    response_code, records = _stream_car_records(response)
+                except (ijson.JSONError, ValueError, urllib3.exceptions.HTTPError):
+                    # Malformed body, or the connection dropped mid-body (raw reads
+                    # raise urllib3 errors, not requests ones)
+                    response_code = None
+                outcome = None if response_code == 1 else "invalid_response"
+    except requests.exceptions.RequestException:
+        if entry is None:
+            raise
+        return entry['views'], entry['name_index'], "STALE"
+
+    if outcome == "not_modified":
+        with _CARS_CACHE_LOCK:
+            _CARS_CACHE[_CARS_URL] = {**entry, 'expires_at': now + ttl}
+        return entry['views'], entry['name_index'], "REVALIDATED"
+
+    if outcome is not None:
+        if entry is None:
+            return None, None, outcome
+        return entry['views'], entry['name_index'], "STALE"
+
+    views = [_car_view(car) for car in records]
+    name_index = _build_name_index(views)
+    with _CARS_CACHE_LOCK:
+        _CARS_CACHE[_CARS_URL] = {
+            'expires_at': now + ttl,
+            'views': views,
+            'name_index': name_index,
+            'etag': validators[0],
+            'last_modified': validators[1]
+        }
+    return views, name_index, "MISS"
+
+
+def _stream_car_records(response: requests.Response) -> Tuple[Any, List[Dict]]:
+    """Stream-parse a /cars response into its responseCode and records.
+
+    Records are built one at a time from the raw body, so the undecoded body
+    is never held in memory alongside the parsed catalogue.
+
+    Returns:
+        tuple: The payload's responseCode and the list of records.
+    """
+    # Let urllib3 undo any gzip/deflate transfer encoding before ijson reads it
+    response.raw.decode_content = True
+
+    response_code = None
+    records = []
+    builder = None
+
+    for prefix, event, value in ijson.parse(response.raw, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'data.records.item' and event == 'end_map':
+                records.append(builder.value)
+                builder = None
+        elif prefix == 'data.records.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'responseCode':
+            response_code = value
+
+    return response_code, records
 
 
 def _transform_for_booking(cars: List[Dict]) -> List[Dict]:
@@ -219,13 +396,24 @@ def check_car_availability(
     """
     models = [model.strip() for model in car_models.split(',')]
     results = {}
+
+    # Fetch the car records once and filter them per model
+    # Any failure (network, malformed body, timing out on another caller's fetch)
+    # reports every model as unavailable, as the per-model lookups this replaced did
+    try:
+        car_records, name_index, _ = _fetch_cars_cached()
+    except Exception:
+        car_records = None
     
     for model in models:
-        result = book_test_drive(f"I want to book test drive for {model}")
+        available_cars = []
+        if car_records is not None:
+            car_model = _extract_car_model(model) or model
+            available_cars = _transform_for_booking(_find_available_cars(car_records, car_model, name_index))
         results[model] = {
-            "available": result["status"] == "available",
-            "count": result["count"],
-            "cars": result["available_cars"]
+            "available": bool(available_cars),
+            "count": len(available_cars),
+            "cars": available_cars
         }
     
     return {
@@ -238,33 +426,30 @@ def check_car_availability(
 @tool(name="get_all_available_cars", description="Get all cars currently available for test drive")
 def get_all_available_cars() -> Dict[str, Any]:
     """Get all active cars available for test drive."""
+    ts = datetime.now().isoformat()
     try:
-        base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/orders/test_drive/cars"
+        car_records, _, cache_status = _fetch_cars_cached()
         
-        response = requests.get(base_url, timeout=10)
-        
-        if response.status_code != 200:
+        if cache_status == "http_error":
             return {
                 "status": "error",
                 "message": "Unable to fetch car data",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
-        data = response.json()
-        
-        if not data or data.get('responseCode') != 1:
+        if cache_status == "invalid_response":
             return {
                 "status": "error",
                 "message": "Invalid response from car database",
                 "available_cars": [],
                 "count": 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
         # Filter only active cars
-        active_cars = [car for car in data['data']['records'] if car.get('IsActive', False)]
+        active_cars = [car['orig'] for car in car_records if car['_active']]
         transformed_cars = _transform_for_booking(active_cars)
         
         return {
@@ -272,7 +457,8 @@ def get_all_available_cars() -> Dict[str, Any]:
             "message": f"Found {len(transformed_cars)} cars available for test drive",
             "available_cars": transformed_cars,
             "count": len(transformed_cars),
-            "timestamp": datetime.now().isoformat()
+            "cache_status": cache_status,
+            "timestamp": ts
         }
         
     except Exception as e:
@@ -281,7 +467,7 @@ def get_all_available_cars() -> Dict[str, Any]:
             "message": f"Error fetching car data: {str(e)}",
             "available_cars": [],
             "count": 0,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
 
 
@@ -1,7 +1,18 @@
 import requests
+from urllib3.util.retry import Retry
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import _EXECUTOR, _json_session
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+
+# Shared HTTP session so repeated tool calls reuse pooled keep-alive connections
+_SESSION = _json_session(Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
 
 
 @tool(name="get_toyota_test_drive_locations", description="Retrieves Toyota test drive locations for a specific car model")
@@ -36,6 +47,7 @@ def get_toyota_test_drive_locations(
             "timestamp": "2024-01-15T10:30:00"
         }
     """
+    ts = datetime.now().isoformat()
     try:
         # Validate required parameter
         if not resource_car_id:
@@ -44,7 +56,7 @@ def get_toyota_test_drive_locations(
                 "error": "resource_car_id is required",
                 "count": 0,
                 "locations": [],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
         # API endpoint configuration
@@ -55,7 +67,7 @@ def get_toyota_test_drive_locations(
             "resourceCarId": resource_car_id
         }
         
-        response = requests.get(base_url, headers=headers)
+        response = _SESSION.get(base_url, headers=headers, timeout=10)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -64,10 +76,10 @@ def get_toyota_test_drive_locations(
                 "error": f"API request failed with status code: {response.status_code}",
                 "count": 0,
                 "locations": [],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
-        data = response.json()
+        data = _json_loads(response.content)
    
         # Check if data is available and response is successful
         if not data or data.get('responseCode') != 1:
@@ -76,7 +88,7 @@ def get_toyota_test_drive_locations(
                 "error": "No location data found in API response or invalid response code",
                 "count": 0,
                 "locations": [],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
         # Extract location data from the response structure
@@ -92,7 +104,7 @@ def get_toyota_test_drive_locations(
             "status": "success",
             "count": len(filtered_locations),
             "locations": filtered_locations,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
         
     except requests.exceptions.RequestException as e:
@@ -101,7 +113,7 @@ def get_toyota_test_drive_locations(
             "error": f"API request failed: {str(e)}",
             "count": 0,
             "locations": [],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
     except Exception as e:
         return {
@@ -109,37 +121,60 @@ def get_toyota_test_drive_locations(
             "error": f"Location lookup failed: {str(e)}",
             "count": 0,
             "locations": [],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
 
+@tool(name="get_toyota_test_drive_locations_many", description="Retrieves Toyota test drive locations for several car models at once")
+def get_toyota_test_drive_locations_many(
+    resource_car_ids: str,
+    city: Optional[str] = None,
+    location_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """Retrieves Toyota test drive locations for several car models concurrently.
+
+    Args:
+        resource_car_ids (str): Comma-separated car resource IDs (e.g., "0HnHp000000u3dYKAQ, 0HnHp000000u3dZKAQ")
+        city (str, optional): Filter locations by city (e.g., 'Doha', 'Lusail')
+        location_name (str, optional): Filter locations by name (e.g., 'Main Showroom', 'City Center')
+
+    Returns:
+        dict: A dictionary containing:
+            - status (str): 'success'
+            - results (dict): get_toyota_test_drive_locations result for each car ID
+            - timestamp (str): When the request was made
+    """
+    car_ids = [car_id.strip() for car_id in resource_car_ids.split(',') if car_id.strip()]
+    futures = {
+        car_id: _EXECUTOR.submit(get_toyota_test_drive_locations, car_id, city, location_name)
+        for car_id in car_ids
+    }
+
+    return {
+        "status": "success",
+        "results": {car_id: future.result() for car_id, future in futures.items()},
+        "timestamp": datetime.now().isoformat()
+    }
+
 def _apply_location_filters(
     locations: List[Dict], 
     city: Optional[str],
     location_name: Optional[str]
 ) -> List[Dict]:
-    """Apply filters to the location list."""
-    filtered = locations
+    """Apply the city and location name filters in a single pass."""
+    # Lowercase the filters once rather than once per location
+    city_lc = city.lower() if city else None
+    name_lc = location_name.lower().strip() if location_name else None
 
-    # City filter
-    if city:
-        filtered = [loc for loc in filtered if _matches_city(loc, city)]
-
-    # Location name filter
-    if location_name:
-        filtered = [loc for loc in filtered if _matches_location_name(loc, location_name)]
-    
-    return filtered
-
-def _matches_city(location: Dict, city: str) -> bool:
-    """Check if location matches the city filter."""
-    location_city = _safe_lower(location.get('City'))
-    return city.lower() in location_city
+    return [
+        loc for loc in locations
+        if (city_lc is None or city_lc in _safe_lower(loc.get('City')))
+        and (name_lc is None or _matches_location_name(loc, name_lc))
+    ]
 
-def _matches_location_name(location: Dict, location_name: str) -> bool:
-    """Check if location matches the name filter."""
+def _matches_location_name(location: Dict, search_term: str) -> bool:
+    """Check if location matches the lowercased, stripped name filter."""
     name = _safe_lower(location.get('Name'))
     external_id = _safe_lower(location.get('External_Id__c'))
-    search_term = location_name.lower().strip()
     
     return (search_term in name or 
             search_term in external_id or
@@ -156,16 +191,9 @@ def _partial_match(field_value: str, search_term: str) -> bool:
     if not field_value or not search_term:
         return False
     
-    # Split both field value and search term into words
-    field_words = field_value.split()
-    search_words = search_term.split()
-    
-    # Check if any search word appears in any field word
-    for search_word in search_words:
-        for field_word in field_words:
-            if search_word in field_word:
-                return True
-    return False
+    # A search word has no whitespace, so it appears inside some word of the
+    # field exactly when it appears in the field as a whole
+    return any(search_word in field_value for search_word in search_term.split())
 
 # Test function to debug the filtering
 def test_location_filtering():
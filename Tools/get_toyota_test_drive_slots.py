@@ -1,14 +1,51 @@
 import requests
-from typing import Optional, Dict, List, Any
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime
+import re
+import threading
+import time
+from itertools import product
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_content import _EXECUTOR, _json_session
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# YYYY-MM-DD, with the same 1-2 digit month and day that strptime('%Y-%m-%d') accepts
+_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+# Shared HTTP session so concurrent and repeated slot lookups reuse keep-alive connections
+# The slots POST is a read-only query, so it is safe to retry; after the last
+# attempt the final response is returned and reported with its status code
+_SESSION = _json_session(Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[429, 502, 503, 504],
+    allowed_methods=["POST"],
+    raise_on_status=False
+))
+# (connect, read) timeouts: fail fast on a stalled handshake, allow time for the slot query
+_REQUEST_TIMEOUT = (3.05, 10)
+
+# How long a successful slot lookup is served from memory before the API is asked again
+SLOTS_CACHE_TTL_SECONDS = 90
+# Upper bound on cached lookups; expired and then oldest entries are dropped past it
+_SLOTS_CACHE_MAX_ENTRIES = 512
+
+# (date, territory_id, vehicle_id) -> (expires_at, slots)
+_SLOTS_CACHE: Dict[Tuple[str, str, str], Tuple[float, List[Any]]] = {}
+_SLOTS_CACHE_LOCK = threading.Lock()
 
 @tool(name="get_toyota_test_drive_slots", description="Retrieves available test drive time slots for a specific car, location, and date")
 def get_toyota_test_drive_slots(
     date: str,
     territory_id: str,
-    vehicle_id: str
+    vehicle_id: str,
+    limit: Optional[int] = None,
+    count_only: bool = False
 ) -> Dict[str, Any]:
     """Retrieves available test drive time slots for a specific car, location, and date.
     
@@ -16,11 +53,13 @@ def get_toyota_test_drive_slots(
         date (str): Date for test drive in YYYY-MM-DD format (e.g., '2025-10-09')
         territory_id (str): Location ID from the locations endpoint (e.g., '0HhHp000000yAcaKAE')
         vehicle_id (str): Car ID from the cars endpoint (e.g., '0HnHp000000u3dYKAQ')
+        limit (int, optional): Return at most this many slots (e.g., 3 for the earliest three)
+        count_only (bool, optional): Return only the number of slots, with an empty slots list
     
     Returns:
         dict: A dictionary containing:
             - status (str): 'success', 'not_found', or 'error'
-            - count (int): Number of available slots found
+            - count (int): Number of available slots found, before any limit is applied
             - slots (list): List of available time slots
             - territory_id (str): The territory ID that was queried
             - timestamp (str): When the request was made
@@ -42,11 +81,26 @@ def get_toyota_test_drive_slots(
             "timestamp": "2024-01-15T10:30:00"
         }
     """
+    ts = datetime.now().isoformat()
     try:
         # Validate required parameters
         validation_error = _validate_slots_parameters(date, territory_id, vehicle_id)
         if validation_error:
-            return validation_error
+            return {**validation_error, "timestamp": ts}
+        
+        # Serve repeat lookups from memory while they are fresh
+        cache_key = (date, territory_id, vehicle_id)
+        cached_slots = _get_cached_slots(cache_key)
+        if cached_slots is not None:
+            return {
+                "status": "success",
+                "count": len(cached_slots),
+                "slots": _select_slots(cached_slots, limit, count_only),
+                "territory_id": territory_id,
+                "date": date,
+                "vehicle_id": vehicle_id,
+                "timestamp": ts
+            }
         
         # API endpoint configuration
         base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/orders/test_drive/slots"
@@ -59,7 +113,7 @@ def get_toyota_test_drive_slots(
         }
         
         # Make API request
-        response = requests.post(base_url, json=payload)
+        response = _SESSION.post(base_url, json=payload, timeout=_REQUEST_TIMEOUT)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -69,10 +123,10 @@ def get_toyota_test_drive_slots(
                 "count": 0,
                 "slots": [],
                 "territory_id": territory_id,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
-        data = response.json()
+        data = _json_loads(response.content)
    
         # Check if data is available and response is successful
         if not data or data.get('responseCode') != 1:
@@ -82,23 +136,32 @@ def get_toyota_test_drive_slots(
                 "count": 0,
                 "slots": [],
                 "territory_id": territory_id,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
         
         # Extract slot data from the response structure
         slot_data = data['data']
         
-        # Find slots for the specific territory
-        available_slots = _extract_slots_for_territory(slot_data, territory_id)
+        # Index the response by territory once and pick the requested one
+        slots_by_territory = _index_by_territory(slot_data)
+        available_slots = slots_by_territory.get(territory_id, [])
+        # Only successful lookups are cached so failures are retried on the next call.
+        # Every territory in the response is cached, so later lookups of another
+        # territory for the same date and vehicle skip the API.
+        slots_by_territory[territory_id] = available_slots
+        _store_cached_slots({
+            (date, other_territory_id, vehicle_id): slots
+            for other_territory_id, slots in slots_by_territory.items()
+        })
         
         return {
             "status": "success",
             "count": len(available_slots),
-            "slots": available_slots,
+            "slots": _select_slots(available_slots, limit, count_only),
             "territory_id": territory_id,
             "date": date,
             "vehicle_id": vehicle_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
         
     except requests.exceptions.RequestException as e:
@@ -108,7 +171,7 @@ def get_toyota_test_drive_slots(
             "count": 0,
             "slots": [],
             "territory_id": territory_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
     except Exception as e:
         return {
@@ -117,18 +180,60 @@ def get_toyota_test_drive_slots(
             "count": 0,
             "slots": [],
             "territory_id": territory_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
 
+@tool(name="get_toyota_test_drive_slots_many", description="Retrieves available test drive time slots for several dates, locations, and cars at once")
+def get_toyota_test_drive_slots_many(
+    dates: str,
+    territory_ids: str,
+    vehicle_ids: str
+) -> Dict[str, Any]:
+    """Retrieves available test drive time slots for every combination of dates, locations, and cars.
+
+    The combinations are looked up concurrently.
+
+    Args:
+        dates (str): Comma-separated dates in YYYY-MM-DD format (e.g., "2025-10-09, 2025-10-10")
+        territory_ids (str): Comma-separated location IDs (e.g., "0HhHp000000yAcaKAE, 0HhHp000000yAcMKAU")
+        vehicle_ids (str): Comma-separated car IDs (e.g., "0HnHp000000u3dYKAQ")
+
+    Returns:
+        dict: A dictionary containing:
+            - status (str): 'success'
+            - count (int): Number of combinations looked up
+            - results (list): get_toyota_test_drive_slots result for each combination,
+              ordered by date, then territory, then vehicle
+            - timestamp (str): When the request was made
+    """
+    combinations = product(_split_ids(dates), _split_ids(territory_ids), _split_ids(vehicle_ids))
+    futures = [
+        _EXECUTOR.submit(get_toyota_test_drive_slots, date, territory_id, vehicle_id)
+        for date, territory_id, vehicle_id in combinations
+    ]
+
+    return {
+        "status": "success",
+        "count": len(futures),
+        "results": [future.result() for future in futures],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _split_ids(values: str) -> List[str]:
+    """Split a comma-separated parameter into its non-empty, stripped items."""
+    return [value.strip() for value in (values or '').split(',') if value.strip()]
+
 def _validate_slots_parameters(date: str, territory_id: str, vehicle_id: str) -> Optional[Dict]:
-    """Validate the input parameters for the slots API."""
+    """Validate the input parameters for the slots API.
+
+    Returns the error response without a timestamp, which the caller adds.
+    """
     if not date:
         return {
             "status": "error",
             "error": "Date is required (YYYY-MM-DD format)",
             "count": 0,
-            "slots": [],
-            "timestamp": datetime.now().isoformat()
+            "slots": []
         }
     
     if not territory_id:
@@ -136,8 +241,7 @@ def _validate_slots_parameters(date: str, territory_id: str, vehicle_id: str) ->
             "status": "error",
             "error": "Territory ID is required",
             "count": 0,
-            "slots": [],
-            "timestamp": datetime.now().isoformat()
+            "slots": []
         }
     
     if not vehicle_id:
@@ -145,30 +249,64 @@ def _validate_slots_parameters(date: str, territory_id: str, vehicle_id: str) ->
             "status": "error",
             "error": "Vehicle ID is required",
             "count": 0,
-            "slots": [],
-            "timestamp": datetime.now().isoformat()
+            "slots": []
         }
     
-    # Validate date format
+    # Validate date format; the shape check rejects most bad input before any
+    # date is built, and datetime() then rejects impossible days like 2025-02-30
+    date_match = _DATE_RE.fullmatch(date)
     try:
-        datetime.strptime(date, '%Y-%m-%d')
+        if not date_match:
+            raise ValueError(date)
+        datetime(*map(int, date_match.groups()))
     except ValueError:
         return {
             "status": "error",
             "error": "Invalid date format. Please use YYYY-MM-DD format",
             "count": 0,
-            "slots": [],
-            "timestamp": datetime.now().isoformat()
+            "slots": []
         }
     
     return None
 
-def _extract_slots_for_territory(slot_data: List[Dict], territory_id: str) -> List[Any]:
-    """Extract slots for a specific territory from the API response."""
-    for territory_data in slot_data:
-        if territory_data.get('territoryId') == territory_id:
-            return territory_data.get('slots', [])
-    return []
+def _get_cached_slots(cache_key: Tuple[str, str, str]) -> Optional[List[Any]]:
+    """Return the cached slots for cache_key if they are still fresh."""
+    with _SLOTS_CACHE_LOCK:
+        entry = _SLOTS_CACHE.get(cache_key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+def _store_cached_slots(entries: Dict[Tuple[str, str, str], List[Any]]) -> None:
+    """Cache each key's slots, evicting expired and then oldest entries when full."""
+    now = time.monotonic()
+    with _SLOTS_CACHE_LOCK:
+        for cache_key, slots in entries.items():
+            _SLOTS_CACHE.pop(cache_key, None)
+            _SLOTS_CACHE[cache_key] = (now + SLOTS_CACHE_TTL_SECONDS, slots)
+        if len(_SLOTS_CACHE) > _SLOTS_CACHE_MAX_ENTRIES:
+            for key in [k for k, (expires_at, _) in _SLOTS_CACHE.items() if expires_at <= now]:
+                del _SLOTS_CACHE[key]
+        while len(_SLOTS_CACHE) > _SLOTS_CACHE_MAX_ENTRIES:
+            del _SLOTS_CACHE[next(iter(_SLOTS_CACHE))]
+
+def _select_slots(slots: List[Any], limit: Optional[int], count_only: bool) -> List[Any]:
+    """Trim the slots returned to the caller; the full list stays in the cache."""
+    if count_only:
+        return []
+    if limit is not None:
+        return slots[:max(int(limit), 0)]
+    return slots
+
+def _index_by_territory(slot_data: List[Dict]) -> Dict[str, List[Any]]:
+    """Map each territory ID in the API response to its slots.
+
+    The first entry wins when a territory is listed twice, as with a linear scan.
+    """
+    return {
+        territory_data.get('territoryId'): territory_data.get('slots', [])
+        for territory_data in reversed(slot_data)
+    }
 
 # # Test function to debug the slots API
 # def test_slots_api():
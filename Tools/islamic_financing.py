@@ -4,6 +4,8 @@ from datetime import datetime
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
 import ast
 import json
+import re
+from functools import lru_cache
 
 # Islamic Finance Terminology Constants
 ISLAMIC_TERMS = {
@@ -26,6 +28,20 @@ VEHICLE_TYPE_MAPPING = {
     'lx700': ['lx700', 'lexus lx700', 'lx 700', 'lexus lx 700']
 }
 
+# One precompiled alternation per vehicle type, in VEHICLE_TYPE_MAPPING priority order
+_VEHICLE_TYPE_PATTERNS = [
+    (standard_value, re.compile('|'.join(map(re.escape, variations))))
+    for standard_value, variations in VEHICLE_TYPE_MAPPING.items()
+]
+
+# Partial-match keywords tried in order when no variation matches
+_FALLBACK_VEHICLE_KEYWORDS = (
+    ('hybrid', 'hybrid'), ('hev', 'hybrid'), ('electric', 'hybrid'),
+    ('land cruiser', 'land_cruiser'), ('landcruiser', 'land_cruiser'), ('lc', 'land_cruiser'),
+    ('lx600', 'lx600'), ('lx 600', 'lx600'),
+    ('lx700', 'lx700'), ('lx 700', 'lx700')
+)
+
 # Current profit rates as per new rules (Murabaha profit rates)
 CURRENT_PROFIT_RATES = {
     'standard': 0.0575,
@@ -60,7 +76,9 @@ def calculate_islamic_financing(
     services_contracts: float = 0,
     comprehensive_insurance: float = 0,
     use_new_rules: bool = True,
-    is_repeat_customer: bool = False
+    is_repeat_customer: bool = False,
+    include_terminology: bool = False,
+    verbose: bool = True
 ) -> Dict[str, Any]:
     """
     Calculate Shariah-compliant vehicle financing using Murabaha (cost-plus) principles.
@@ -76,11 +94,15 @@ def calculate_islamic_financing(
     comprehensive_insurance (float): Comprehensive insurance amount in AED
     use_new_rules (bool): Whether to use new rules (5.75% standard) or old rules (6.8% standard)
     is_repeat_customer (bool): Whether customer is repeat IHF client for special rates
+    include_terminology (bool): Whether to embed the Islamic terminology glossary in the result;
+        it never changes, so agents can fetch it once with get_islamic_terminology instead
+    verbose (bool): Whether to include the input parameters, business rules and terminology
+        sections; set to False when only the financial breakdown and costs are needed
     
     Returns:
     Dict[str, Any]: Comprehensive Islamic financing calculation with Shariah compliance details
     """
-    
+    calculation_timestamp = datetime.now().isoformat()
     try:
         # Safely convert all numeric inputs to float
         vehicle_value = _safe_float_convert(vehicle_value, 65700.0)
@@ -101,35 +123,44 @@ def calculate_islamic_financing(
         # Get appropriate profit rate based on vehicle type and rules
         profit_rate = _get_profit_rate(vehicle_type, down_payment_percentage, is_repeat_customer, use_new_rules)
         
-        # Calculate balance amount (Al-Baqi) - ensure float
-        balance_amount = float(vehicle_value) - float(down_payment)
-        
-        # Calculate profit amount (Al-Ribh) using flat rate method for Murabaha
-        # Ensure all values are float before calculation
-        profit_amount = float(balance_amount) * float(profit_rate) * (float(tenure_months) / 12.0)
-        
-        # Calculate total financing amount (Al-Mablagh Al-Muwazzaf)
-        total_financing_amount = float(balance_amount) + float(profit_amount)
-        
-        # Calculate monthly instalment (Al-Qist Al-Shahri)
-        monthly_instalment = float(total_financing_amount) / float(tenure_months)
-        
-        # Calculate total payable amount
-        total_payable = float(total_financing_amount) + float(down_payment)
-        
-        # Calculate additional costs
-        total_additional_costs = float(services_contracts) + float(comprehensive_insurance)
-        grand_total = float(total_payable) + total_additional_costs
+        breakdown = _compute_financing(
+            vehicle_value, down_payment, tenure_months, profit_rate,
+            services_contracts, comprehensive_insurance
+        )
         
         # Prepare comprehensive Islamic financing result
         result = {
             'success': True,
-            'calculation_timestamp': datetime.now().isoformat(),
+            'calculation_timestamp': calculation_timestamp,
             'shariah_compliant': True,
             'financing_model': 'Murabaha (Cost-Plus)',
             
+            # Financial breakdown
+            'financial_breakdown': {
+                'vehicle_value_aed': round(vehicle_value, 2),
+                'down_payment_aed': round(down_payment, 2),
+                'down_payment_percentage': round(down_payment_percentage, 2),
+                'balance_amount_aed': round(breakdown['balance_amount'], 2),
+                'profit_rate_percentage': round(profit_rate * 100, 3),
+                'profit_amount_aed': round(breakdown['profit_amount'], 2),
+                'total_financing_amount_aed': round(breakdown['total_financing_amount'], 2),
+                'monthly_instalment_aed': round(breakdown['monthly_instalment'], 2),
+                'total_payable_aed': round(breakdown['total_payable'], 2)
+            },
+            
+            # Additional costs summary
+            'additional_costs': {
+                'services_contracts_aed': round(services_contracts, 2),
+                'comprehensive_insurance_aed': round(comprehensive_insurance, 2),
+                'total_additional_costs_aed': round(breakdown['total_additional_costs'], 2),
+                'grand_total_aed': round(breakdown['grand_total'], 2)
+            }
+        }
+        
+        # Descriptive sections, skipped when only the numbers are needed
+        if verbose:
             # Input parameters
-            'input_parameters': {
+            result['input_parameters'] = {
                 'vehicle_value': vehicle_value,
                 'down_payment': down_payment,
                 'tenure_months': tenure_months,
@@ -139,40 +170,19 @@ def calculate_islamic_financing(
                 'comprehensive_insurance': comprehensive_insurance,
                 'use_new_rules': use_new_rules,
                 'is_repeat_customer': is_repeat_customer
-            },
-            
-            # Financial breakdown
-            'financial_breakdown': {
-                'vehicle_value_aed': round(float(vehicle_value), 2),
-                'down_payment_aed': round(float(down_payment), 2),
-                'down_payment_percentage': round(float(down_payment_percentage), 2),
-                'balance_amount_aed': round(float(balance_amount), 2),
-                'profit_rate_percentage': round(float(profit_rate) * 100, 3),
-                'profit_amount_aed': round(float(profit_amount), 2),
-                'total_financing_amount_aed': round(float(total_financing_amount), 2),
-                'monthly_instalment_aed': round(float(monthly_instalment), 2),
-                'total_payable_aed': round(float(total_payable), 2)
-            },
-            
-            # Islamic terminology
-            'islamic_terminology': ISLAMIC_TERMS,
-            
-            # Additional costs summary
-            'additional_costs': {
-                'services_contracts_aed': round(float(services_contracts), 2),
-                'comprehensive_insurance_aed': round(float(comprehensive_insurance), 2),
-                'total_additional_costs_aed': round(float(total_additional_costs), 2),
-                'grand_total_aed': round(float(grand_total), 2)
-            },
+            }
             
             # Business rules applied
-            'business_rules_applied': {
+            result['business_rules_applied'] = {
                 'max_tenure_months': 60 if customer_type.lower() == 'qatari' else 48,
                 'rules_version': 'new_rules_2024' if use_new_rules else 'old_rules',
                 'repeat_customer_discount': 'applied' if is_repeat_customer else 'not_applied',
                 'vehicle_specific_rates': 'applied'
             }
-        }
+            
+            # Islamic terminology
+            if include_terminology:
+                result['islamic_terminology'] = ISLAMIC_TERMS
         
         return result
         
@@ -180,10 +190,48 @@ def calculate_islamic_financing(
         return {
             'success': False,
             'error': f"Calculation error: {str(e)}",
-            'calculation_timestamp': datetime.now().isoformat(),
+            'calculation_timestamp': calculation_timestamp,
             'shariah_compliant': True
         }
 
+def _compute_financing(
+    vehicle_value: float,
+    down_payment: float,
+    tenure_months: int,
+    profit_rate: float,
+    services_contracts: float = 0.0,
+    comprehensive_insurance: float = 0.0
+) -> Dict[str, float]:
+    """Compute the Murabaha breakdown from already converted and validated inputs"""
+    # Calculate balance amount (Al-Baqi)
+    balance_amount = vehicle_value - down_payment
+    
+    # Calculate profit amount (Al-Ribh) using flat rate method for Murabaha
+    profit_amount = balance_amount * profit_rate * (tenure_months / 12.0)
+    
+    # Calculate total financing amount (Al-Mablagh Al-Muwazzaf)
+    total_financing_amount = balance_amount + profit_amount
+    
+    # Calculate monthly instalment (Al-Qist Al-Shahri)
+    monthly_instalment = total_financing_amount / tenure_months
+    
+    # Calculate total payable amount
+    total_payable = total_financing_amount + down_payment
+    
+    # Calculate additional costs
+    total_additional_costs = services_contracts + comprehensive_insurance
+    grand_total = total_payable + total_additional_costs
+    
+    return {
+        'balance_amount': balance_amount,
+        'profit_amount': profit_amount,
+        'total_financing_amount': total_financing_amount,
+        'monthly_instalment': monthly_instalment,
+        'total_payable': total_payable,
+        'total_additional_costs': total_additional_costs,
+        'grand_total': grand_total
+    }
+
 def _normalize_vehicle_type(vehicle_input: str) -> str:
     """Normalize vehicle type input to standard values"""
     if not vehicle_input:
@@ -191,21 +239,35 @@ def _normalize_vehicle_type(vehicle_input: str) -> str:
     
     vehicle_input_lower = str(vehicle_input).lower().strip()
     
-    for standard_value, variations in VEHICLE_TYPE_MAPPING.items():
-        if vehicle_input_lower in variations or any(variation in vehicle_input_lower for variation in variations):
-            return standard_value
+    # Known variations resolve with a single dict lookup
+    exact_match = _EXACT_VEHICLE_TYPES.get(vehicle_input_lower)
+    if exact_match:
+        return exact_match
+    
+    match = _match_vehicle_type(vehicle_input_lower)
+    if match:
+        return match
     
     # Fallback to partial matching
-    if any(keyword in vehicle_input_lower for keyword in ['hybrid', 'hev', 'electric']):
-        return 'hybrid'
-    elif any(keyword in vehicle_input_lower for keyword in ['land cruiser', 'landcruiser', 'lc']):
-        return 'land_cruiser'
-    elif any(keyword in vehicle_input_lower for keyword in ['lx600', 'lx 600']):
-        return 'lx600'
-    elif any(keyword in vehicle_input_lower for keyword in ['lx700', 'lx 700']):
-        return 'lx700'
-    else:
-        return 'standard'
+    for keyword, standard_value in _FALLBACK_VEHICLE_KEYWORDS:
+        if keyword in vehicle_input_lower:
+            return standard_value
+    return 'standard'
+
+def _match_vehicle_type(vehicle_input_lower: str) -> Optional[str]:
+    """Return the first vehicle type with a variation contained in the input."""
+    for standard_value, pattern in _VEHICLE_TYPE_PATTERNS:
+        if pattern.search(vehicle_input_lower):
+            return standard_value
+    return None
+
+# Every known variation -> its vehicle type, resolved with the same priority as
+# the substring scan (e.g. 'land cruiser hybrid' contains 'hybrid', which wins)
+_EXACT_VEHICLE_TYPES = {
+    variation: _match_vehicle_type(variation)
+    for variations in VEHICLE_TYPE_MAPPING.values()
+    for variation in variations
+}
 
 def _validate_inputs(vehicle_value: float, down_payment: float, tenure_months: int, customer_type: str):
     """Validate all input parameters"""
@@ -231,13 +293,22 @@ def _get_profit_rate(vehicle_type: str, down_payment_percentage: float, is_repea
     # Ensure down_payment_percentage is float
     down_payment_percentage = _safe_float_convert(down_payment_percentage, 0.0)
     
+    # Only the 50% down payment threshold affects the rate, so the cached lookup
+    # is keyed on which side of it the percentage falls
+    return _get_profit_rate_cached(
+        vehicle_type, down_payment_percentage < 50, bool(is_repeat_customer), bool(use_new_rules)
+    )
+
+@lru_cache(maxsize=64)
+def _get_profit_rate_cached(vehicle_type: str, below_half_down_payment: bool, is_repeat_customer: bool, use_new_rules: bool) -> float:
+    """Profit rate for a vehicle type and down payment bucket, memoised over the small key space"""
     if use_new_rules:
         base_rate = CURRENT_PROFIT_RATES.get(vehicle_type, CURRENT_PROFIT_RATES['standard'])
     else:
         # Old rules logic
         if vehicle_type == 'hybrid':
             base_rate = 0.049  # 4.9% for HEV
-        elif vehicle_type in ['land_cruiser', 'lx600', 'lx700'] and down_payment_percentage < 50:
+        elif vehicle_type in ['land_cruiser', 'lx600', 'lx700'] and below_half_down_payment:
             base_rate = 0.0816  # 8.16% for LC/LX with <50% down payment
         else:
             base_rate = 0.068  # 6.8% standard
@@ -248,6 +319,21 @@ def _get_profit_rate(vehicle_type: str, down_payment_percentage: float, is_repea
     
     return float(base_rate)
 
+@tool(name="get_islamic_terminology", description="Get the Islamic finance terminology used in financing calculations")
+def get_islamic_terminology() -> Dict[str, Any]:
+    """
+    Get the Arabic Islamic finance terms for each field of a financing calculation
+    
+    Returns:
+    Dict[str, Any]: Mapping of calculation fields to their Islamic finance terms
+    """
+    
+    return {
+        'success': True,
+        'islamic_terminology': ISLAMIC_TERMS,
+        'timestamp': datetime.now().isoformat()
+    }
+
 @tool(name="get_available_vehicle_types", description="Get list of supported vehicle types and their current profit rates")
 def get_available_vehicle_types(use_new_rules: bool = True) -> Dict[str, Any]:
     """
@@ -302,27 +388,38 @@ def calculate_multiple_scenarios(
     
     scenarios = []
     
+    # Resolve the inputs shared by every scenario once instead of per scenario
+    vehicle_value_amount = _safe_float_convert(vehicle_value, 65700.0)
+    normalized_vehicle_type = _normalize_vehicle_type(vehicle_type)
+    
     for down_payment in down_payments:
+        down_payment_amount = _safe_float_convert(down_payment, 10000.0)
+        # Profit rate for this down payment, computed for the first valid tenure and shared by the rest
+        profit_rate = None
+        
         for tenure in tenures:
+            tenure_months = int(_safe_float_convert(tenure, 48))
             try:
-                result = calculate_islamic_financing(
-                    vehicle_value=vehicle_value,
-                    down_payment=down_payment,
-                    tenure_months=tenure,
-                    vehicle_type=vehicle_type,
-                    customer_type=customer_type
-                )
+                _validate_inputs(vehicle_value_amount, down_payment_amount, tenure_months, customer_type)
+            except Exception:
+                # Scenarios outside the financing rules are left out of the comparison
+                continue
+            
+            try:
+                if profit_rate is None:
+                    down_payment_percentage = (down_payment_amount / vehicle_value_amount) * 100
+                    profit_rate = _get_profit_rate(normalized_vehicle_type, down_payment_percentage, False, True)
+                
+                breakdown = _compute_financing(vehicle_value_amount, down_payment_amount, tenure_months, profit_rate)
                 
-                if result['success']:
-                    financial_data = result['financial_breakdown']
-                    scenarios.append({
-                        'down_payment_aed': _safe_float_convert(down_payment),
-                        'down_payment_percentage': financial_data['down_payment_percentage'],
-                        'tenure_months': int(tenure),
-                        'monthly_instalment_aed': financial_data['monthly_instalment_aed'],
-                        'total_payable_aed': financial_data['total_payable_aed'],
-                        'profit_amount_aed': financial_data['profit_amount_aed']
-                    })
+                scenarios.append({
+                    'down_payment_aed': _safe_float_convert(down_payment),
+                    'down_payment_percentage': round(down_payment_percentage, 2),
+                    'tenure_months': int(tenure),
+                    'monthly_instalment_aed': round(breakdown['monthly_instalment'], 2),
+                    'total_payable_aed': round(breakdown['total_payable'], 2),
+                    'profit_amount_aed': round(breakdown['profit_amount'], 2)
+                })
             except Exception as e:
                 # Log the error but continue with other scenarios
                 print(f"Warning: Scenario failed for down_payment={down_payment}, tenure={tenure}: {e}")
@@ -1,8 +1,6 @@
-import requests
-import re
-from typing import Optional, Dict, List, Any
-from datetime import datetime
+from typing import Dict, Any
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_otp_core import _request_otp_impl
 
 
 @tool(name="request_toyota_mobile_otp", description="Request OTP verification code for Toyota mobile authentication")
@@ -16,7 +14,7 @@ def request_toyota_mobile_otp(
     
     Returns:
         dict: A dictionary containing:
-            - status (str): 'success', 'invalid_mobile', or 'error'
+            - status (str): 'success', 'invalid_mobile', 'rate_limited', or 'error'
             - message (str): Descriptive message about the result
             - timestamp (str): When the OTP was requested
             - server_time (str): Server timestamp from the response
@@ -35,146 +33,7 @@ def request_toyota_mobile_otp(
             "response_code": 1
         }
     """
-    try:
-        # Validate mobile number format
-        validation_error = _validate_mobile_number(mobile)
-        if validation_error:
-            return validation_error
-        
-        # API endpoint configuration
-        base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/auth/otp/mobile/request"
-        
-        # Request payload
-        payload = {
-            "mobile": mobile
-        }
-        
-        # Request headers
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "Toyota-OTP-Client/1.0"
-        }
-        
-        # Make API request
-        response = requests.post(
-            base_url, 
-            json=payload, 
-            headers=headers,
-            timeout=30
-        )
-        
-        # Check if request was successful
-        if response.status_code != 200:
-            return {
-                "status": "error",
-                "error": f"API request failed with status code: {response.status_code}",
-                "message": "Failed to send OTP",
-                "timestamp": datetime.now().isoformat(),
-                "response_code": None
-            }
-        
-        data = response.json()
-   
-        # Check if data is available and response is successful
-        if not data:
-            return {
-                "status": "error",
-                "error": "No response data received from server",
-                "message": "Failed to send OTP",
-                "timestamp": datetime.now().isoformat(),
-                "response_code": None
-            }
-        
-        # Check response code (1 indicates success based on your example)
-        response_code = data.get('responseCode')
-        if response_code != 1:
-            error_message = data.get('message', 'Unknown error occurred')
-            return {
-                "status": "error",
-                "error": f"OTP request failed: {error_message}",
-                "message": "Failed to send OTP",
-                "timestamp": datetime.now().isoformat(),
-                "response_code": response_code
-            }
-        
-        # Extract response data
-        server_time = data.get('data', {}).get('time') if data.get('data') else None
-        
-        return {
-            "status": "success",
-            "message": "OTP sent successfully",
-            "timestamp": datetime.now().isoformat(),
-            "server_time": server_time,
-            "response_code": response_code,
-            "api_message": data.get('message', 'Success')
-        }
-        
-    except requests.exceptions.Timeout:
-        return {
-            "status": "error",
-            "error": "API request timed out",
-            "message": "Network timeout while sending OTP",
-            "timestamp": datetime.now().isoformat(),
-            "response_code": None
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "error": f"API request failed: {str(e)}",
-            "message": "Network error while sending OTP",
-            "timestamp": datetime.now().isoformat(),
-            "response_code": None
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"OTP request failed: {str(e)}",
-            "message": "Unexpected error occurred",
-            "timestamp": datetime.now().isoformat(),
-            "response_code": None
-        }
-
-
-def _validate_mobile_number(mobile: str) -> Optional[Dict]:
-    """Validate the mobile number format."""
-    if not mobile:
-        return {
-            "status": "invalid_mobile",
-            "error": "Mobile number is required",
-            "message": "Please provide a mobile number",
-            "timestamp": datetime.now().isoformat(),
-            "response_code": None
-        }
-    
-    # Remove any spaces or special characters except +
-    cleaned_mobile = re.sub(r'[^\d+]', '', mobile)
-    
-    # Basic validation for international format
-    # Should start with + followed by country code and number
-    if not re.match(r'^\+\d{8,15}$', cleaned_mobile):
-        return {
-            "status": "invalid_mobile",
-            "error": "Invalid mobile number format",
-            "message": "Please provide a valid mobile number in international format (e.g., +97403012045)",
-            "timestamp": datetime.now().isoformat(),
-            "response_code": None
-        }
-    
-    # Simplified Qatar validation - only check if starts with +974 and has 8 digits after
-    if cleaned_mobile.startswith('+974'):
-        # Remove +974 and check if remaining are exactly 8 digits
-        digits_after_country_code = cleaned_mobile[4:]  # Remove '+974'
-        if len(digits_after_country_code) != 8:
-            return {
-                "status": "invalid_mobile",
-                "error": "Invalid Qatar mobile number length",
-                "message": "Qatar mobile numbers should have exactly 8 digits after +974",
-                "timestamp": datetime.now().isoformat(),
-                "response_code": None
-            }
-        # No additional validation - any 8 digits are acceptable including starting with 0
-    
-    return None
+    return _request_otp_impl(mobile, include_response_code=True)
 
 
 # Test function for the new OTP tool
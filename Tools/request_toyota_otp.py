@@ -1,8 +1,10 @@
-import requests
-import re
-from typing import Optional, Dict, List, Any
-from datetime import datetime
+import logging
+from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
 from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from _toyota_otp_core import _request_otp_impl, _validate_mobile_number, _now_iso
+
+logger = logging.getLogger(__name__)
 
 
 @tool(name="request_toyota_otp", description="Request OTP verification code for Toyota test drive booking")
@@ -16,7 +18,7 @@ def request_toyota_otp(
     
     Returns:
         dict: A dictionary containing:
-            - status (str): 'success', 'invalid_mobile', or 'error'
+            - status (str): 'success', 'invalid_mobile', 'rate_limited', or 'error'
             - message (str): Descriptive message about the result
             - timestamp (str): When the OTP was requested
             - server_time (str): Server timestamp from the response
@@ -33,104 +35,7 @@ def request_toyota_otp(
             "server_time": "2025-10-10T05:36:44.860Z"
         }
     """
-    try:
-        # Validate mobile number format
-        validation_error = _validate_mobile_number(mobile)
-        if validation_error:
-            return validation_error
-        
-        # API endpoint configuration
-        base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/auth/otp/mobile/request"
-        
-        # Request payload
-        payload = {
-            "mobile": mobile
-        }
-        
-        # Make API request
-        response = requests.post(base_url, json=payload)
-        
-        # Check if request was successful
-        if response.status_code != 200:
-            return {
-                "status": "error",
-                "error": f"API request failed with status code: {response.status_code}",
-                "message": "Failed to send OTP",
-                "timestamp": datetime.now().isoformat()
-            }
-        
-        data = response.json()
-   
-        # Check if data is available and response is successful
-        if not data or data.get('responseCode') != 1:
-            error_message = data.get('message', 'Unknown error occurred') if data else 'No response from server'
-            return {
-                "status": "error",
-                "error": f"OTP request failed: {error_message}",
-                "message": "Failed to send OTP",
-                "timestamp": datetime.now().isoformat()
-            }
-        
-        # Extract response data
-        server_time = data['data']['time'] if data.get('data') and data['data'].get('time') else None
-        
-        return {
-            "status": "success",
-            "message": "OTP sent successfully",
-            "timestamp": datetime.now().isoformat(),
-            "server_time": server_time,
-            "response_message": data.get('message', 'Success')
-        }
-        
-    except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "error": f"API request failed: {str(e)}",
-            "message": "Network error while sending OTP",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"OTP request failed: {str(e)}",
-            "message": "Unexpected error occurred",
-            "timestamp": datetime.now().isoformat()
-        }
-
-def _validate_mobile_number(mobile: str) -> Optional[Dict]:
-    """Validate the mobile number format."""
-    if not mobile:
-        return {
-            "status": "invalid_mobile",
-            "error": "Mobile number is required",
-            "message": "Please provide a mobile number",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    # Remove any spaces or special characters except +
-    cleaned_mobile = re.sub(r'[^\d+]', '', mobile)
-    
-    # Basic validation for international format
-    # Should start with + followed by country code and number
-    if not re.match(r'^\+\d{8,15}$', cleaned_mobile):
-        return {
-            "status": "invalid_mobile",
-            "error": "Invalid mobile number format",
-            "message": "Please provide a valid mobile number in international format (e.g., +97403012026)",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    # Specific validation for Qatar numbers (+974) if needed
-    if cleaned_mobile.startswith('+974'):
-        if len(cleaned_mobile) != 11:  # +974 + 8 digits
-            return {
-                "status": "invalid_mobile",
-                "error": "Invalid Qatar mobile number",
-                "message": "Qatar mobile numbers should be 8 digits after +974",
-                "timestamp": datetime.now().isoformat()
-            }
-    
-    return None
+    return _request_otp_impl(mobile, include_response_code=False)
 
 # Test function to debug the OTP API
 def test_otp_api():
@@ -194,7 +99,7 @@ def debug_otp_api_payload():
 
 def validate_mobile_format(mobile: str) -> Dict[str, Any]:
     """Helper function to validate mobile number format separately."""
-    validation_result = _validate_mobile_number(mobile)
+    validation_result = _validate_mobile_number(mobile, include_response_code=False)
     if validation_result:
         return validation_result
     else:
@@ -202,32 +107,35 @@ def validate_mobile_format(mobile: str) -> Dict[str, Any]:
             "status": "valid",
             "message": "Mobile number format is valid",
             "mobile": mobile,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
 
 #Batch OTP request function for testing multiple numbers
 def batch_otp_test(mobile_numbers: List[str]) -> List[Dict[str, Any]]:
-    """Test OTP requests for multiple mobile numbers."""
-    results = []
-    print(f"Batch testing {len(mobile_numbers)} mobile numbers:")
-    print("=" * 50)
+    """Test OTP requests for multiple mobile numbers, sent concurrently."""
+    logger.debug("Batch testing %d mobile numbers", len(mobile_numbers))
     
-    for mobile in mobile_numbers:
-        print(f"\nTesting: {mobile}")
-        result = request_toyota_otp(mobile)
-        results.append({"mobile": mobile, **result})
-        
-        print(f"  Status: {result['status']}")
-        print(f"  Message: {result['message']}")
-        
-        if result['status'] == 'success':
-            print(f"  ✓ OTP sent successfully")
-        else:
-            print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
+    # Send the requests concurrently; map keeps the results in input order
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(request_toyota_otp, mobile_numbers))
+    
+    results = [{"mobile": mobile, **result} for mobile, result in zip(mobile_numbers, responses)]
+    
+    # Per-number report, skipped entirely unless debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        for result in results:
+            if result['status'] == 'success':
+                logger.debug("%s: %s - OTP sent successfully", result['mobile'], result['message'])
+            else:
+                logger.debug("%s: %s - failed: %s", result['mobile'], result['message'], result.get('error', 'Unknown error'))
     
     return results
 
 if __name__ == "__main__":
+    # Show this module's per-number batch report without urllib3's debug chatter
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
+    
     # Show API details
     debug_otp_api_payload()
     
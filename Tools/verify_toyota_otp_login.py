@@ -1,8 +1,83 @@
+import base64
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import hashlib
+import threading
+import time
 from typing import Optional, Dict, List, Any
+from functools import lru_cache
 from datetime import datetime
-from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from concurrent.futures import Future
+
+try:
+    from ibm_watsonx_orchestrate.agent_builder.tools import tool
+except ImportError:
+    # Local debugging without the orchestrate SDK: register nothing, leave the function as is
+    def tool(*args: Any, **kwargs: Any) -> Any:
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+from _toyota_otp_core import _clean_mobile_number, _error, _now_iso
+
+# Toyota Qatar backend and its OTP login endpoint
+_BACKEND_URL = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net"
+LOGIN_URL = f"{_BACKEND_URL}/api/v1/auth/login/mobile"
+
+# International format: + followed by 8-15 digits
+_INTL_MOBILE_RE = re.compile(r'^\+\d{8,15}$')
+
+# sha256(mobile|otp|otp_start_time) -> future for the login currently being sent for that request,
+# so concurrent identical calls (e.g. agent retries) share one round trip and one OTP use
+_INFLIGHT_LOGINS: Dict[bytes, Future] = {}
+_INFLIGHT_LOGINS_LOCK = threading.Lock()
+
+# With TOYOTA_KEEPALIVE=1 a background thread touches the backend this often, so the
+# pooled TLS connection outlives the App Service idle timeout (about 4 minutes)
+_KEEPALIVE_INTERVAL_SECONDS = 180
+
+# (connect, read) timeouts in seconds: fail fast on a stalled handshake, still give the server time to answer
+_CONNECT_TIMEOUT = float(os.environ.get("TOYOTA_CONNECT_TIMEOUT", "3.0"))
+_READ_TIMEOUT = float(os.environ.get("TOYOTA_READ_TIMEOUT", "8.0"))
+
+# Shared HTTP session so repeated logins reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # A login consumes the OTP, so only retry when the request cannot have been
+    # acted on: connection failures and service-unavailable responses
+    max_retries=Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[503],
+        allowed_methods=["POST"],
+        raise_on_status=False
+    )
+))
+
+
+def _keepalive_loop() -> None:
+    """Send a HEAD request to the backend every _KEEPALIVE_INTERVAL_SECONDS to keep a pooled connection open."""
+    while True:
+        time.sleep(_KEEPALIVE_INTERVAL_SECONDS)
+        try:
+            _SESSION.head(_BACKEND_URL, timeout=2)
+        except requests.exceptions.RequestException:
+            # The next login will simply open a fresh connection
+            pass
+
+if os.environ.get("TOYOTA_KEEPALIVE") == "1":
+    threading.Thread(target=_keepalive_loop, name="toyota-login-keepalive", daemon=True).start()
 
 
 @tool(name="verify_toyota_otp_login", description="Verify OTP and login to Toyota test drive system")
@@ -20,7 +95,8 @@ def verify_toyota_otp_login(
     
     Returns:
         dict: A dictionary containing:
-            - status (str): 'success', 'invalid_otp', 'invalid_mobile', or 'error'
+            - status (str): 'success', 'invalid_otp', 'invalid_mobile', 'connect_timeout',
+              'read_timeout', or 'error'
             - message (str): Descriptive message about the result
             - access_token (str): JWT access token for authenticated requests
             - refresh_token (str): JWT refresh token for token renewal
@@ -48,14 +124,42 @@ def verify_toyota_otp_login(
         }
     """
     try:
+        # Surrounding whitespace is not part of the code; strip it once so the
+        # validated, deduplicated and sent OTP are the same string
+        otp = otp.strip() if otp else otp
+        
         # Validate input parameters
         validation_error = _validate_login_parameters(mobile, otp, otp_start_time)
         if validation_error:
             return validation_error
         
-        # API endpoint configuration
-        base_url = "https://web-backenddev-cont-001-ajath8a5beh9eycz.westeurope-01.azurewebsites.net/api/v1/auth/login/mobile"
+        # Share the result of an identical login that is already in flight
+        login_key = hashlib.sha256(f"{mobile}|{otp}|{otp_start_time}".encode()).digest()
+        with _INFLIGHT_LOGINS_LOCK:
+            pending = _INFLIGHT_LOGINS.get(login_key)
+            if pending is None:
+                future = _INFLIGHT_LOGINS[login_key] = Future()
+        if pending is not None:
+            return {**pending.result(), "timestamp": _now_iso()}
+        
+        try:
+            result = _login(mobile, otp, otp_start_time)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with _INFLIGHT_LOGINS_LOCK:
+                del _INFLIGHT_LOGINS[login_key]
+        return result
         
+    except Exception as e:
+        return _error(f"Login failed: {e}", "Unexpected error during login")
+
+def _login(mobile: str, otp: str, otp_start_time: str) -> Dict[str, Any]:
+    """Call the login API and build the tool response."""
+    try:
         # Request payload
         payload = {
             "mobile": mobile,
@@ -64,168 +168,127 @@ def verify_toyota_otp_login(
         }
         
         # Make API request
-        response = requests.post(base_url, json=payload)
+        response = _SESSION.post(LOGIN_URL, json=payload, timeout=(_CONNECT_TIMEOUT, _READ_TIMEOUT))
         
         # Check if request was successful
         if response.status_code != 200:
-            return {
-                "status": "error",
-                "error": f"API request failed with status code: {response.status_code}",
-                "message": "Login failed due to server error",
-                "timestamp": datetime.now().isoformat()
-            }
+            return _error(f"API request failed with status code: {response.status_code}", "Login failed due to server error")
         
-        data = response.json()
+        data = _json_loads(response.content)
    
         # Check if data is available and response is successful
         if not data:
-            return {
-                "status": "error",
-                "error": "No response data received from server",
-                "message": "Login failed - no server response",
-                "timestamp": datetime.now().isoformat()
-            }
+            return _error("No response data received from server", "Login failed - no server response")
         
         if data.get('responseCode') != 1:
             error_message = data.get('message', 'Unknown authentication error')
             status = 'invalid_otp' if 'otp' in error_message.lower() else 'error'
-            return {
-                "status": status,
-                "error": f"Authentication failed: {error_message}",
-                "message": "Login failed - invalid credentials",
-                "timestamp": datetime.now().isoformat()
-            }
+            return _error(f"Authentication failed: {error_message}", "Login failed - invalid credentials", status=status)
         
         # Extract authentication data
         auth_data = data['data']
+        access_token = auth_data.get('accessToken')
+        # Non-string tokens cannot be decoded (or used as a memo key)
+        token_payload = _decode_token_payload(access_token) if isinstance(access_token, str) else None
         
-        return {
+        result = {
             "status": "success",
             "message": "Login successful",
-            "access_token": auth_data.get('accessToken'),
+            "access_token": access_token,
             "refresh_token": auth_data.get('refreshToken'),
             "must_update_user_data": auth_data.get('mustUpdateUserData', False),
             "must_add_mobile": auth_data.get('mustAddMobile', False),
-            "user_id": _extract_user_id_from_token(auth_data.get('accessToken')),
-            "timestamp": datetime.now().isoformat(),
+            "user_id": _user_id_from_payload(token_payload),
+            "timestamp": _now_iso(),
             "response_message": data.get('message', 'Success')
         }
+        return result
         
+    except requests.exceptions.ConnectTimeout as e:
+        # Nothing reached the server, so the caller can retry straight away
+        return _error(f"Connection timed out: {e}", "Could not reach the login service", status="connect_timeout")
+    except requests.exceptions.ReadTimeout as e:
+        return _error(f"Server response timed out: {e}", "Login service did not respond in time", status="read_timeout")
     except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "error": f"API request failed: {str(e)}",
-            "message": "Network error during login",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"Login failed: {str(e)}",
-            "message": "Unexpected error during login",
-            "timestamp": datetime.now().isoformat()
-        }
+        return _error(f"API request failed: {e}", "Network error during login")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # Malformed response: not JSON (ValueError), or missing/mistyped fields
+        return _error(f"Login failed: {e}", "Unexpected response from the login service")
 
 def _validate_login_parameters(mobile: str, otp: str, otp_start_time: str) -> Optional[Dict]:
-    """Validate the login parameters."""
-    # Validate mobile number
-    mobile_validation = _validate_mobile_number(mobile)
-    if mobile_validation:
-        return mobile_validation
-    
-    # Validate OTP
-    if not otp or not otp.strip():
-        return {
-            "status": "invalid_otp",
-            "error": "OTP code is required",
-            "message": "Please enter the OTP code",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    if not re.match(r'^\d{4,8}$', otp.strip()):
-        return {
-            "status": "invalid_otp",
-            "error": "Invalid OTP format",
-            "message": "OTP should be 4-8 digits",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    # Validate OTP start time
-    if not otp_start_time:
-        return {
-            "status": "error",
-            "error": "OTP start time is required",
-            "message": "OTP timestamp is missing",
-            "timestamp": datetime.now().isoformat()
-        }
+    """Validate the login parameters in one pass, returning the error response for the first invalid one.
+
+    otp is expected already stripped by the caller, so it is validated as it will be sent.
+    """
+    if not mobile:
+        problem = ("invalid_mobile", "Mobile number is required", "Please provide a mobile number")
+    # Basic validation for international format, ignoring spaces and special characters except +
+    elif not _INTL_MOBILE_RE.match(_clean_mobile_number(mobile)):
+        problem = ("invalid_mobile", "Invalid mobile number format", "Please provide a valid mobile number in international format (e.g., +97403012026)")
+    elif not otp:
+        problem = ("invalid_otp", "OTP code is required", "Please enter the OTP code")
+    # OTP codes are 4-8 digits; isdecimal accepts exactly the digits \d does
+    elif not (4 <= len(otp) <= 8 and otp.isdecimal()):
+        problem = ("invalid_otp", "Invalid OTP format", "OTP should be 4-8 digits")
+    elif not otp_start_time:
+        problem = ("error", "OTP start time is required", "OTP timestamp is missing")
+    elif not _is_iso_timestamp(otp_start_time):
+        problem = ("error", "Invalid OTP start time format", "OTP timestamp should be in ISO format (e.g., 2025-10-10T05:36:44.860Z)")
+    else:
+        return None
     
+    status, error, message = problem
+    return _error(error, message, status=status)
+
+def _is_iso_timestamp(value: str) -> bool:
+    """Whether value parses as an ISO format timestamp, accepting a trailing Z for UTC."""
     try:
-        # Try to parse the ISO format timestamp
-        datetime.fromisoformat(otp_start_time.replace('Z', '+00:00'))
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
     except ValueError:
-        return {
-            "status": "error",
-            "error": "Invalid OTP start time format",
-            "message": "OTP timestamp should be in ISO format (e.g., 2025-10-10T05:36:44.860Z)",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    return None
+        return False
+    return True
 
-def _validate_mobile_number(mobile: str) -> Optional[Dict]:
-    """Validate the mobile number format."""
-    if not mobile:
-        return {
-            "status": "invalid_mobile",
-            "error": "Mobile number is required",
-            "message": "Please provide a mobile number",
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    # Remove any spaces or special characters except +
-    cleaned_mobile = re.sub(r'[^\d+]', '', mobile)
-    
-    # Basic validation for international format
-    if not re.match(r'^\+\d{8,15}$', cleaned_mobile):
-        return {
-            "status": "invalid_mobile",
-            "error": "Invalid mobile number format",
-            "message": "Please provide a valid mobile number in international format (e.g., +97403012026)",
-            "timestamp": datetime.now().isoformat()
-        }
+def _user_id_from_payload(payload_data: Optional[Dict]) -> Optional[str]:
+    """Extract user ID from a decoded JWT payload."""
+    if not payload_data:
+        return None
     
-    return None
+    try:
+        # Extract user ID from payload
+        user_info = payload_data.get('user', {})
+        return user_info.get('id')
+        
+    except Exception:
+        # If extraction fails, return None
+        return None
 
-def _extract_user_id_from_token(token: Optional[str]) -> Optional[str]:
-    """Extract user ID from JWT token (basic extraction without verification)."""
+@lru_cache(maxsize=1024)
+def _decode_token_payload(token: Optional[str]) -> Optional[Dict]:
+    """Decode the payload of a JWT token (basic decoding without verification).
+    
+    Tokens are immutable, so decoded payloads are memoised; callers share the
+    returned dict and must not mutate it.
+    """
     if not token:
         return None
     
     try:
-        # Basic JWT parsing (without verification)
-        parts = token.split('.')
-        if len(parts) != 3:
+        # Basic JWT parsing (without verification); the split stops before the signature.
+        # Payloads under 8 characters cannot hold a user or expiry, so skip decoding them
+        parts = token.split('.', 2)
+        if len(parts) != 3 or len(parts[1]) < 8:
             return None
         
-        import base64
-        import json
-        
-        # Decode the payload
+        # Decode the base64url payload, restoring the padding JWTs strip
         payload = parts[1]
-        # Add padding if needed
-        padding = 4 - len(payload) % 4
-        if padding != 4:
-            payload += '=' * padding
-        
-        decoded_payload = base64.b64decode(payload)
-        payload_data = json.loads(decoded_payload)
+        payload += '==='[:-len(payload) % 4]
         
-        # Extract user ID from payload
-        user_info = payload_data.get('user', {})
-        return user_info.get('id')
+        decoded_payload = base64.urlsafe_b64decode(payload)
+        payload_data = _json_loads(decoded_payload)
+        return payload_data if isinstance(payload_data, dict) else None
         
     except Exception:
-        # If extraction fails, return None
+        # If decoding fails, return None
         return None
 
 # Test function to debug the login API
@@ -316,7 +379,7 @@ def _extract_user_id_from_token(token: Optional[str]) -> Optional[str]:
 #             "timestamp": datetime.now().isoformat()
 #         }
     
-#     if not re.match(r'^\d{4,8}$', otp.strip()):
+#     if not (4 <= len(otp.strip()) <= 8 and otp.strip().isdecimal()):
 #         return {
 #             "status": "invalid",
 #             "message": "OTP should be 4-8 digits",